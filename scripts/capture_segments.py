@@ -0,0 +1,227 @@
+"""
+Append-only segment log for gRPC captures.
+
+Instead of a .bin/.json/.txt file trio per response, every capture becomes
+one framed record appended to a daily segment file with a single writev():
+
+    segment_YYYYMMDD.bin   <IIII header (meta, body and strings lengths, reserved)
+                           + meta (JSON) + body + strings (newline-separated)
+    segments.idx           one JSON line per record: segment, offset, length, path, ts, status
+
+Readers map the segment with mmap and jump straight to a record offset.
+
+Shared by the mitmproxy addon (grpc_capture.py) and the standalone proxy
+(grpc_capture_server.py).
+"""
+
+import json
+import mmap
+import os
+import re
+import struct
+import tempfile
+import time
+from collections import namedtuple
+from pathlib import Path
+
+from capture_strings import StringScanner
+
+try:
+    from orjson import dumps as _dumps
+except ImportError:  # optional: same compact JSON, just slower
+    def _dumps(obj) -> bytes:
+        return json.dumps(obj, separators=(",", ":")).encode()
+
+# Session-related endpoints worth capturing
+CAPTURE_ENDPOINTS = ["StreamCascadeReactiveUpdates", "GetCascade", "HandleAsync"]
+# All endpoints as one alternation, so a path is filtered in a single search
+CAPTURE_PATTERN = re.compile("|".join(map(re.escape, CAPTURE_ENDPOINTS)))
+
+RECORD_HEADER = struct.Struct("<IIII")
+INDEX_FILE = "segments.idx"
+
+CaptureRecord = namedtuple("CaptureRecord", "offset meta body strings")
+
+_APPEND_FLAGS = os.O_WRONLY | os.O_CREAT | os.O_APPEND
+
+
+class CaptureStream:
+    """Response stream callable that tees the body to a spool file.
+
+    With scan=True the string scanner is fed inline as well; otherwise the
+    caller extracts strings from spool_path() itself, e.g. in a process pool.
+    """
+
+    def __init__(self, spool_dir: Path, min_length: int = 10, scan: bool = True):
+        self.size = 0
+        self.scanner = StringScanner(min_length) if scan else None
+        # Unlinked again as soon as the capture is closed
+        self._spool = tempfile.NamedTemporaryFile(dir=spool_dir, prefix=".spool-")
+
+    def __call__(self, chunk: bytes) -> bytes:
+        # mitmproxy passes b"" once the body is complete
+        if chunk:
+            self._spool.write(chunk)
+            self.size += len(chunk)
+            if self.scanner is not None:
+                self.scanner.feed(chunk)
+        return chunk
+
+    def spool_path(self) -> str:
+        """Flush the spool and return its path for another process to read"""
+        self._spool.flush()
+        return self._spool.name
+
+    def body(self) -> mmap.mmap:
+        """Map the spooled body without reading it into memory"""
+        self._spool.flush()
+        return mmap.mmap(self._spool.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def close(self):
+        self._spool.close()
+
+
+class SegmentWriter:
+    """Appends capture records to the current day's segment file.
+
+    Only one writer may own a given name; concurrent processes each pass
+    their own (e.g. "segment-w1") and share the index.
+    """
+
+    def __init__(self, directory: Path, name: str = "segment"):
+        self.directory = directory
+        self.name = name
+        self._segment = None
+        self._day_end_ns = 0
+        self._segment_fd = None
+        self._index_fd = os.open(directory / INDEX_FILE, _APPEND_FLAGS, 0o644)
+
+    def _roll(self, ts_ns: int):
+        """Switch to the segment for the local day containing ts_ns"""
+        t = time.localtime(ts_ns // 1_000_000_000)
+        # mktime normalises tm_mday + 1 across month and year ends
+        next_midnight = time.mktime((t.tm_year, t.tm_mon, t.tm_mday + 1, 0, 0, 0, 0, 0, -1))
+
+        self._close_segment()
+        self._segment = f"{self.name}_{t.tm_year:04d}{t.tm_mon:02d}{t.tm_mday:02d}.bin"
+        self._segment_fd = os.open(self.directory / self._segment, _APPEND_FLAGS, 0o644)
+        self._day_end_ns = int(next_midnight) * 1_000_000_000
+
+    def append(self, meta: dict, body, strings: list = ()) -> dict:
+        """Append one record and its index entry; body may be any buffer.
+
+        meta must carry at least "ts" (ns), "path" and "status".
+        """
+        # Only the first record of each day pays for calendar formatting
+        if meta["ts"] >= self._day_end_ns:
+            self._roll(meta["ts"])
+
+        meta_blob = _dumps(meta)
+        strings_blob = "\n".join(strings).encode()
+        header = RECORD_HEADER.pack(len(meta_blob), len(body), len(strings_blob), 0)
+
+        # Sole writer, so the current size is where this record lands
+        offset = os.fstat(self._segment_fd).st_size
+        length = RECORD_HEADER.size + len(meta_blob) + len(body) + len(strings_blob)
+        try:
+            written = os.writev(self._segment_fd, [header, meta_blob, body, strings_blob])
+        except OSError:
+            # A torn record would misalign every record appended after it
+            os.ftruncate(self._segment_fd, offset)
+            raise
+        if written != length:
+            os.ftruncate(self._segment_fd, offset)
+            raise OSError(f"Short write to {self._segment} at offset {offset}")
+
+        entry = {
+            "segment": self._segment,
+            "offset": offset,
+            "length": length,
+            "path": meta["path"],
+            "ts": meta["ts"],
+            "status": meta["status"],
+        }
+        os.write(self._index_fd, _dumps(entry) + b"\n")
+        return entry
+
+    def append_capture(self, stream: CaptureStream, path: str, status: int, strings: list = None, **meta) -> dict:
+        """Append a fully received CaptureStream; strings default to its scanner's"""
+        if strings is None:
+            strings = stream.scanner.close()
+        meta = {
+            "ts": time.time_ns(),
+            "path": path,
+            "status": status,
+            **meta,
+            "size_bytes": stream.size,
+        }
+
+        with stream.body() as body:
+            return self.append(meta, body, strings)
+
+    def _close_segment(self):
+        if self._segment_fd is not None:
+            os.close(self._segment_fd)
+            self._segment_fd = None
+
+    def close(self):
+        self._close_segment()
+        os.close(self._index_fd)
+
+
+class SegmentReader:
+    """Random access to the records of a segment file through mmap"""
+
+    def __init__(self, filepath: Path):
+        self.filepath = Path(filepath)
+        self._fh = open(self.filepath, "rb")
+        size = os.fstat(self._fh.fileno()).st_size
+        # mmap refuses empty files; an empty segment simply has no records
+        self._mm = mmap.mmap(self._fh.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+
+    def record_at(self, offset: int) -> CaptureRecord:
+        """Read the record starting at offset; raises ValueError if it is cut short"""
+        start = offset + RECORD_HEADER.size
+        if start > len(self._mm):
+            raise ValueError(f"truncated record at {offset} in {self.filepath.name}")
+        meta_len, body_len, strings_len, _ = RECORD_HEADER.unpack_from(self._mm, offset)
+        # Slicing the map past its end would silently return short data
+        if start + meta_len + body_len + strings_len > len(self._mm):
+            raise ValueError(f"truncated record at {offset} in {self.filepath.name}")
+        meta = json.loads(self._mm[start:start + meta_len])
+        start += meta_len
+        body = self._mm[start:start + body_len]
+        start += body_len
+        strings = self._mm[start:start + strings_len].decode().split("\n") if strings_len else []
+        return CaptureRecord(offset, meta, body, strings)
+
+    def __iter__(self):
+        offset = 0
+        while offset < len(self._mm):
+            yield self.record_at(offset)
+            meta_len, body_len, strings_len, _ = RECORD_HEADER.unpack_from(self._mm, offset)
+            offset += RECORD_HEADER.size + meta_len + body_len + strings_len
+
+    def close(self):
+        if isinstance(self._mm, mmap.mmap):
+            self._mm.close()
+        self._fh.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def read_index(directory: Path) -> list:
+    """Load all index entries for the segments in directory"""
+    index_path = Path(directory) / INDEX_FILE
+    if not index_path.exists():
+        return []
+    with open(index_path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def is_segment(filepath) -> bool:
+    return Path(filepath).name.startswith("segment") and Path(filepath).suffix == ".bin"
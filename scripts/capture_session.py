@@ -9,15 +9,24 @@ Usage:
     1. Start capture: python capture_session.py start
     2. Switch sessions in Antigravity UI
     3. Stop capture: python capture_session.py stop
-    4. Decode: python capture_session.py decode session_capture.bin
+    4. Decode: python capture_session.py decode session_capture.bin [more.bin ...]
+
+Decoding uses the protoscope CLI when it is installed, then a built-in
+wire-format walker.
 """
 
 import sys
 import os
+import mmap
 import subprocess
-import struct
+import traceback
+from datetime import datetime
 from pathlib import Path
 
+from capture_segments import SegmentReader, is_segment, read_index
+from capture_strings import extract_strings
+from protowire import decode_content, format_body
+
 CAPTURE_DIR = Path(__file__).parent.parent / "history_dump" / "grpc_captures"
 CAPTURE_DIR.mkdir(parents=True, exist_ok=True)
 
@@ -53,48 +62,124 @@ def start_capture():
         print("\n✅ Capture stopped")
         print(f"📁 Saved to: {capture_file}")
 
-def decode_protobuf(filepath: str):
+def format_ts(ts_ns: int) -> str:
+    """Render a capture's nanosecond timestamp as local ISO time"""
+    return datetime.fromtimestamp(ts_ns / 1e9).isoformat(timespec="milliseconds")
+
+PROTOSCOPE_HINT = "go install github.com/protocolbuffers/protoscope/cmd/protoscope@latest"
+
+class Protoscope:
+    """Schemaless protobuf decoding through the protoscope CLI.
+
+    Shared across all files of one decode run so a missing protoscope is
+    only reported once.
+    """
+    
+    def __init__(self):
+        self.available = True
+    
+    def decode(self, data) -> str:
+        """Return protoscope's rendering of data, or None if protoscope is unavailable"""
+        if not self.available:
+            return None
+        try:
+            result = subprocess.run(["protoscope"], input=data, capture_output=True)
+        except FileNotFoundError:
+            print(f"⚠️  protoscope not found. Install with: {PROTOSCOPE_HINT}")
+            self.available = False
+            return None
+        if result.returncode != 0:
+            return None
+        return result.stdout.decode(errors="replace")
+
+def decode_protobuf(filepath: str, protoscope: Protoscope):
     """Decode protobuf without schema using protoscope."""
     import base64
     
     print(f"📖 Decoding: {filepath}")
     
-    # Try protoscope first
-    try:
-        result = subprocess.run(
-            ["protoscope", "-I", filepath],
-            capture_output=True, text=True
-        )
-        if result.returncode == 0:
-            output_file = Path(filepath).with_suffix('.decoded.txt')
-            output_file.write_text(result.stdout)
-            print(f"✅ Decoded with protoscope: {output_file}")
+    # The capture is memory-mapped so no pass copies it into Python
+    with open(filepath, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            print("📭 Empty capture, nothing to decode")
             return
-    except FileNotFoundError:
-        print("⚠️  protoscope not found. Install with: go install github.com/protocolbuffers/protoscope/cmd/protoscope@latest")
+        
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            try:
+                # Try protoscope first
+                text = protoscope.decode(data)
+                if text is not None:
+                    output_file = Path(filepath).with_suffix('.decoded.txt')
+                    output_file.write_text(text)
+                    print(f"✅ Decoded with protoscope: {output_file}")
+                    return
+                
+                # Fallback: walk the wire format ourselves, then extract strings
+                print("🔍 Walking protobuf wire format...")
+                try:
+                    output_file = Path(filepath).with_suffix('.decoded.txt')
+                    output_file.write_text(format_body(data))
+                    print(f"✅ Decoded wire format: {output_file}")
+                except ValueError as e:
+                    print(f"⚠️  Not a protobuf message: {e}")
+                
+                print("🔍 Extracting strings from binary...")
+                
+                # Extract printable strings (length >= 5)
+                strings = extract_strings(data, min_length=5)
+            except BaseException as e:
+                # The walker's frames in the traceback still hold memoryviews of
+                # the map; drop them so closing it doesn't mask e with a BufferError
+                traceback.clear_frames(e.__traceback__)
+                raise
     
-    # Fallback: raw hex dump with string extraction
-    print("🔍 Extracting strings from binary...")
-    with open(filepath, 'rb') as f:
-        data = f.read()
+    output_file = Path(filepath).with_suffix('.strings.txt')
+    output_file.write_text("\n".join(strings))
+    print(f"✅ Extracted {len(strings)} strings: {output_file}")
+
+def decode_segment(filepath: str, protoscope: Protoscope):
+    """Decode every record of a segment log, one section per record."""
+    print(f"📖 Decoding segment: {filepath}")
     
-    # Extract printable strings (length >= 5)
+    decoded = []
     strings = []
-    current = ""
-    for byte in data:
-        if 32 <= byte < 127:
-            current += chr(byte)
-        else:
-            if len(current) >= 5:
-                strings.append(current)
-            current = ""
-    
-    if len(current) >= 5:
-        strings.append(current)
+    
+    with SegmentReader(filepath) as segment:
+        try:
+            for record in segment:
+                meta = record.meta
+                header = f"# {record.offset} {format_ts(meta['ts'])} {meta['path']} (status {meta['status']}, {len(record.body):,} bytes)"
+                
+                try:
+                    body = decode_content(record.body, meta.get("content_encoding"))
+                except ValueError as e:
+                    decoded.append(f"{header}\n# cannot undo content-encoding: {e}")
+                    body = None
+                
+                if body is not None:
+                    text = protoscope.decode(body)
+                    if text is not None:
+                        decoded.append(header + "\n" + text)
+                    else:
+                        try:
+                            decoded.append(header + "\n" + format_body(body))
+                        except ValueError as e:
+                            decoded.append(f"{header}\n# not a protobuf message: {e}")
+                
+                # Extracted (min_length 10) when the record was captured, no rescan needed
+                strings.append(header + "\n" + "\n".join(record.strings))
+        except ValueError as e:
+            # Only the tail can be torn (a crash mid-append); keep what came before
+            print(f"⚠️  Stopped at torn tail: {e}")
+    
+    if decoded:
+        output_file = Path(filepath).with_suffix('.decoded.txt')
+        output_file.write_text("\n".join(decoded))
+        print(f"✅ Decoded {len(decoded)} records: {output_file}")
     
     output_file = Path(filepath).with_suffix('.strings.txt')
     output_file.write_text("\n".join(strings))
-    print(f"✅ Extracted {len(strings)} strings: {output_file}")
+    print(f"✅ Extracted strings from {len(strings)} records: {output_file}")
 
 def list_captures():
     """List existing captures."""
@@ -107,6 +192,12 @@ def list_captures():
     for c in sorted(captures):
         size = c.stat().st_size
         print(f"   {c.name} ({size:,} bytes)")
+    
+    entries = read_index(CAPTURE_DIR)
+    if entries:
+        print(f"\n🗂️  Segment records ({len(entries)}):")
+        for e in entries:
+            print(f"   {e['segment']}@{e['offset']} {format_ts(e['ts'])} {e['path']} ({e['length']:,} bytes)")
 
 def main():
     if len(sys.argv) < 2:
@@ -123,9 +214,14 @@ def main():
         start_capture()
     elif cmd == "decode":
         if len(sys.argv) < 3:
-            print("Usage: capture_session.py decode <file>")
+            print("Usage: capture_session.py decode <file> [<file> ...]")
             sys.exit(1)
-        decode_protobuf(sys.argv[2])
+        protoscope = Protoscope()
+        for filepath in sys.argv[2:]:
+            if is_segment(filepath):
+                decode_segment(filepath, protoscope)
+            else:
+                decode_protobuf(filepath, protoscope)
     elif cmd == "list":
         list_captures()
     else:
@@ -0,0 +1,86 @@
+"""
+Printable-string extraction shared by the gRPC capture scripts.
+
+Used by capture_session.py (decode fallback) and grpc_capture.py (mitmproxy
+addon) to pull readable text out of raw protobuf captures.
+"""
+
+import mmap
+import os
+import re
+
+from protowire import decode_content
+
+# Compiled run patterns keyed on min_length
+_PATTERNS = {}
+
+# bytes.translate table mapping every non-printable byte to NUL
+_PRINTABLE_TABLE = bytes(b if 32 <= b < 127 else 0 for b in range(256))
+
+
+def _printable_run_pattern(min_length: int) -> re.Pattern:
+    """Pattern matching runs of printable ASCII (0x20-0x7e) of min_length+"""
+    pattern = _PATTERNS.get(min_length)
+    if pattern is None:
+        pattern = re.compile(rb'[\x20-\x7e]{%d,}' % min_length)
+        _PATTERNS[min_length] = pattern
+    return pattern
+
+
+def extract_strings(data: bytes, min_length: int = 10) -> list:
+    """Extract runs of printable ASCII (0x20-0x7e) of at least min_length bytes"""
+    pattern = _printable_run_pattern(min_length)
+    return [m.group().decode('ascii') for m in pattern.finditer(data)]
+
+
+def extract_strings_from_file(filepath: str, min_length: int = 10, content_encoding: str = None) -> list:
+    """extract_strings() over a memory-mapped file, e.g. in a worker process.
+
+    A body captured with a Content-Encoding is decoded first; raises
+    ValueError if that fails.
+    """
+    with open(filepath, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return []
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            if content_encoding:
+                return extract_strings(decode_content(data, content_encoding), min_length)
+            return extract_strings(data, min_length)
+
+
+class StringScanner:
+    """Incremental extract_strings() for bodies that arrive in chunks.
+
+    Each chunk is scrubbed with bytes.translate and split on NUL, two C
+    passes that beat the regex on the text-heavy bodies being captured.
+    The trailing printable run of each chunk is accumulated in a bytearray
+    until a non-printable byte (or close()) terminates it, so strings
+    spanning chunk boundaries come out whole without rescanning them.
+    """
+
+    def __init__(self, min_length: int = 10):
+        self.min_length = min_length
+        self.strings = []
+        self._pending = bytearray()
+
+    def feed(self, chunk: bytes):
+        """Scan the next chunk of the body"""
+        runs = chunk.translate(_PRINTABLE_TABLE).split(b"\0")
+        pending = self._pending
+        pending += runs[0]
+        if len(runs) == 1:
+            return
+
+        min_length = self.min_length
+        if len(pending) >= min_length:
+            self.strings.append(pending.decode('ascii'))
+        pending.clear()
+        pending += runs.pop()
+        self.strings.extend(r.decode('ascii') for r in runs[1:] if len(r) >= min_length)
+
+    def close(self) -> list:
+        """Flush the pending run and return every string found"""
+        if len(self._pending) >= self.min_length:
+            self.strings.append(self._pending.decode('ascii'))
+        self._pending.clear()
+        return self.strings
@@ -9,86 +9,101 @@ Then configure Antigravity to use proxy or redirect traffic:
     iptables -t nat -A OUTPUT -p tcp --dport 43405 -j REDIRECT --to-port 43406
 """
 
-import json
+import asyncio
 import os
-from datetime import datetime
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
 from pathlib import Path
 from mitmproxy import http, ctx
 
+from capture_segments import CAPTURE_PATTERN, CaptureStream, SegmentWriter
+from capture_strings import extract_strings_from_file
+
 OUTPUT_DIR = Path("/workspace/grpc_captures")
 OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
 
 class GrpcCapture:
+    __slots__ = ("segments", "pool", "pending", "streams")
+    
     def __init__(self):
-        self.capture_count = 0
+        self.segments = SegmentWriter(OUTPUT_DIR)
+        # String extraction runs here, off mitmproxy's single event loop
+        self.pool = ProcessPoolExecutor(max_workers=os.cpu_count())
+        self.pending = set()
+        # In-flight captures by flow.id; flow.metadata gets deep-copied on save
+        self.streams = {}
         ctx.log.info("🎯 gRPC Capture addon loaded")
     
     def request(self, flow: http.HTTPFlow):
         """Log incoming requests"""
-        if "StreamCascade" in flow.request.path or "Cascade" in flow.request.path:
+        if "Cascade" in flow.request.path:
             ctx.log.info(f"📥 Request: {flow.request.method} {flow.request.path}")
     
+    def responseheaders(self, flow: http.HTTPFlow):
+        """Stream session-related responses to disk as they arrive"""
+        # Filter for session-related endpoints
+        if CAPTURE_PATTERN.search(flow.request.path):
+            stream = CaptureStream(OUTPUT_DIR, scan=False)
+            flow.response.stream = stream
+            self.streams[flow.id] = stream
+    
     def response(self, flow: http.HTTPFlow):
-        """Capture gRPC responses"""
-        path = flow.request.path
+        """Hand a completed capture off for string extraction and return immediately"""
+        stream = self.streams.pop(flow.id, None)
+        if stream is None:
+            return
         
-        # Filter for session-related endpoints
-        if any(ep in path for ep in ["StreamCascadeReactiveUpdates", "GetCascade", "HandleAsync"]):
-            self.capture_count += 1
+        if not stream.size:
+            stream.close()
+            return
+        
+        request, response = flow.request, flow.response
+        meta = {
+            "ts": time.time_ns(),
+            "method": request.method,
+            "content_type": response.headers.get("content-type", "unknown"),
+            # The stream tees raw wire bytes, so the body is stored still encoded
+            "content_encoding": response.headers.get("content-encoding"),
+        }
+        task = asyncio.get_running_loop().create_task(
+            self._finish(stream, request.path, response.status_code, meta)
+        )
+        pending = self.pending
+        pending.add(task)
+        task.add_done_callback(pending.discard)
+    
+    async def _finish(self, stream: CaptureStream, path: str, status: int, meta: dict):
+        """Extract strings in the pool, then append the capture to the segment log"""
+        try:
+            try:
+                strings = await asyncio.get_running_loop().run_in_executor(
+                    self.pool,
+                    partial(extract_strings_from_file, content_encoding=meta["content_encoding"]),
+                    stream.spool_path(),
+                )
+            except Exception as e:
+                ctx.log.warn(f"   ⚠️ String extraction failed: {e}")
+                strings = []
             
-            # Get response body
-            body = flow.response.content
+            entry = self.segments.append_capture(stream, path, status, strings, **meta)
             
-            if body and len(body) > 0:
-                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                filename = f"capture_{timestamp}_{self.capture_count}.bin"
-                filepath = OUTPUT_DIR / filename
-                
-                # Save raw binary
-                filepath.write_bytes(body)
-                
-                # Also save metadata
-                meta = {
-                    "timestamp": datetime.now().isoformat(),
-                    "path": path,
-                    "method": flow.request.method,
-                    "status": flow.response.status_code,
-                    "content_type": flow.response.headers.get("content-type", "unknown"),
-                    "size_bytes": len(body),
-                    "filename": filename
-                }
-                
-                meta_path = OUTPUT_DIR / f"capture_{timestamp}_{self.capture_count}.json"
-                meta_path.write_text(json.dumps(meta, indent=2))
-                
-                ctx.log.info(f"💾 Captured: {filename} ({len(body):,} bytes)")
-                
-                # Try to extract readable strings
-                try:
-                    strings = self._extract_strings(body)
-                    if strings:
-                        strings_path = OUTPUT_DIR / f"capture_{timestamp}_{self.capture_count}.txt"
-                        strings_path.write_text("\n".join(strings))
-                        ctx.log.info(f"   📝 Extracted {len(strings)} strings")
-                except Exception as e:
-                    ctx.log.warn(f"   ⚠️ String extraction failed: {e}")
+            ctx.log.info(f"💾 Captured: {entry['segment']}@{entry['offset']} ({stream.size:,} bytes)")
+            if strings:
+                ctx.log.info(f"   📝 Extracted {len(strings)} strings")
+        finally:
+            stream.close()
     
-    def _extract_strings(self, data: bytes, min_length: int = 10) -> list:
-        """Extract printable strings from binary data"""
-        strings = []
-        current = ""
-        
-        for byte in data:
-            if 32 <= byte < 127:
-                current += chr(byte)
-            else:
-                if len(current) >= min_length:
-                    strings.append(current)
-                current = ""
-        
-        if len(current) >= min_length:
-            strings.append(current)
-        
-        return strings
+    def error(self, flow: http.HTTPFlow):
+        """Drop the spool of a stream that was cut off"""
+        stream = self.streams.pop(flow.id, None)
+        if stream is not None:
+            stream.close()
+    
+    async def done(self):
+        if self.pending:
+            await asyncio.gather(*self.pending)
+        self.pool.shutdown()
+        self.segments.close()
 
 addons = [GrpcCapture()]
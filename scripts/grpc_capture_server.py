@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+Multi-process HTTP/2 reverse proxy that captures Antigravity gRPC session data.
+
+Drop-in alternative to running grpc_capture.py under mitmdump, whose single
+FlowMaster thread caps a busy StreamCascadeReactiveUpdates stream at one
+core. Each worker process binds the listen port with SO_REUSEPORT so the
+kernel spreads connections across them, forwards to the language server
+over HTTP/2 and appends matching responses to its own segment log
+(segment-w<N>_YYYYMMDD.bin), so workers never contend for a file.
+
+Usage:
+    python grpc_capture_server.py --upstream http://localhost:43405 -p 43406 -w 4
+
+Then redirect traffic exactly as for the mitmproxy addon.
+
+Requires: pip install hypercorn 'httpx[http2]'
+
+Note: httpx does not surface upstream HTTP/2 trailers. The Connect protocol
+used by the language server ends streams in-band so this is fine there,
+but plain gRPC status trailers are not relayed.
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import os
+import socket
+from pathlib import Path
+
+import httpx
+from hypercorn.asyncio import serve
+from hypercorn.config import Config
+
+from capture_segments import CAPTURE_PATTERN, CaptureStream, SegmentWriter
+from capture_strings import extract_strings_from_file
+
+OUTPUT_DIR = Path("/workspace/grpc_captures")
+
+# Connection-specific headers that must not be forwarded
+HOP_BY_HOP = {b"connection", b"keep-alive", b"proxy-connection", b"transfer-encoding", b"upgrade", b"host"}
+
+
+class CaptureProxy:
+    """ASGI app forwarding every request upstream and teeing matching responses"""
+
+    def __init__(self, upstream: str, output_dir: Path, worker: int):
+        self.upstream = upstream.rstrip("/")
+        self.output_dir = output_dir
+        self.worker = worker
+        self.client = None
+        self.segments = None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+        elif scope["type"] == "http":
+            await self._proxy(scope, receive, send)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                # Prior-knowledge h2c, same as the language server speaks
+                self.client = httpx.AsyncClient(http1=False, http2=True, timeout=None)
+                self.segments = SegmentWriter(self.output_dir, name=f"segment-w{self.worker}")
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await self.client.aclose()
+                self.segments.close()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def _request_body(self, receive):
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                return
+            yield message.get("body", b"")
+            if not message.get("more_body", False):
+                return
+
+    async def _proxy(self, scope, receive, send):
+        path = (scope.get("raw_path") or scope["path"].encode()).decode()
+        if scope["query_string"]:
+            path += "?" + scope["query_string"].decode()
+
+        request = self.client.build_request(
+            scope["method"],
+            self.upstream + path,
+            headers=[(k, v) for k, v in scope["headers"] if k not in HOP_BY_HOP],
+            content=self._request_body(receive),
+        )
+        try:
+            response = await self.client.send(request, stream=True)
+        except httpx.TransportError as e:
+            print(f"⚠️  [w{self.worker}] Upstream unreachable for {path}: {e!r}")
+            await send({"type": "http.response.start", "status": 502, "headers": []})
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        # aiter_raw() yields the body still encoded, so encoded bodies are
+        # scanned for strings after decoding the spool instead of inline
+        encoding = response.headers.get("content-encoding")
+        if CAPTURE_PATTERN.search(path):
+            stream = CaptureStream(self.output_dir, scan=not encoding)
+        else:
+            stream = None
+        try:
+            await send({
+                "type": "http.response.start",
+                "status": response.status_code,
+                "headers": [(k, v) for k, v in response.headers.raw if k.lower() not in HOP_BY_HOP],
+            })
+            async for chunk in response.aiter_raw():
+                if stream is not None:
+                    stream(chunk)
+                await send({"type": "http.response.body", "body": chunk, "more_body": True})
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+            if stream is not None and stream.size:
+                strings = None
+                if encoding:
+                    try:
+                        strings = await asyncio.to_thread(
+                            extract_strings_from_file, stream.spool_path(), content_encoding=encoding
+                        )
+                    except ValueError as e:
+                        print(f"⚠️  [w{self.worker}] String extraction failed: {e}")
+                        strings = []
+                entry = self.segments.append_capture(
+                    stream,
+                    path,
+                    response.status_code,
+                    strings,
+                    method=scope["method"],
+                    content_type=response.headers.get("content-type", "unknown"),
+                    content_encoding=encoding,
+                )
+                print(f"💾 [w{self.worker}] Captured: {entry['segment']}@{entry['offset']} ({stream.size:,} bytes)")
+        finally:
+            await response.aclose()
+            if stream is not None:
+                stream.close()
+
+
+def run_worker(worker: int, args):
+    """Serve the proxy on a SO_REUSEPORT socket of this worker's own"""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    sock.bind((args.host, args.port))
+
+    config = Config()
+    config.bind = [f"fd://{sock.detach()}"]
+    config.accesslog = None
+
+    app = CaptureProxy(args.upstream, args.output, worker)
+    asyncio.run(serve(app, config))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sharded HTTP/2 capture proxy for the Antigravity language server")
+    parser.add_argument("--upstream", default="http://localhost:43405", help="language server URL")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("-p", "--port", type=int, default=43406)
+    parser.add_argument("-w", "--workers", type=int, default=os.cpu_count())
+    parser.add_argument("-o", "--output", type=Path, default=OUTPUT_DIR)
+    args = parser.parse_args()
+
+    args.output.mkdir(parents=True, exist_ok=True)
+
+    print(f"🔌 Proxying {args.host}:{args.port} -> {args.upstream} with {args.workers} workers")
+    print(f"📁 Saving to: {args.output}")
+
+    workers = [
+        multiprocessing.Process(target=run_worker, args=(n, args), daemon=True)
+        for n in range(1, args.workers + 1)
+    ]
+    for w in workers:
+        w.start()
+
+    try:
+        for w in workers:
+            w.join()
+    except KeyboardInterrupt:
+        print("\n✅ Capture stopped")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+"""
+Schemaless protobuf wire-format decoding for captured gRPC/Connect bodies.
+
+Fallback for capture_session.py when protoscope isn't installed. Bodies are
+split into {1-byte flags, 4-byte big-endian length, message} envelopes and
+each message is walked field by field, guessing nested messages and
+strings for length-delimited fields the way protoscope does.
+
+Everything works on memoryviews so walking a capture never copies it.
+"""
+
+import gzip
+import zlib
+
+VARINT, FIXED64, LEN, FIXED32 = 0, 1, 2, 5
+
+FLAG_COMPRESSED = 0x01
+FLAG_END_STREAM = 0x02
+
+MAX_DEPTH = 16
+
+# Content-Encoding tokens that leave the body as is
+IDENTITY_ENCODINGS = {"", "identity"}
+
+
+def decode_varint(buf, pos: int) -> tuple:
+    """Decode a LEB128 varint at pos, returning (value, next_pos)"""
+    try:
+        byte = buf[pos]
+        if byte < 0x80:
+            return byte, pos + 1
+
+        value = byte & 0x7f
+        shift = 7
+        pos += 1
+        while True:
+            byte = buf[pos]
+            pos += 1
+            value |= (byte & 0x7f) << shift
+            if byte < 0x80:
+                return value, pos
+            shift += 7
+            if shift >= 70:
+                raise ValueError("varint longer than 10 bytes")
+    except IndexError:
+        raise ValueError("truncated varint") from None
+
+
+def decode_content(data, encoding: str = None):
+    """Undo an HTTP Content-Encoding (gzip or deflate) on a captured body.
+
+    Raises ValueError for unsupported encodings or corrupt data.
+    """
+    # Codings are listed in the order they were applied
+    for coding in reversed((encoding or "").lower().split(",")):
+        coding = coding.strip()
+        if coding in IDENTITY_ENCODINGS:
+            continue
+        try:
+            if coding in ("gzip", "x-gzip"):
+                data = gzip.decompress(data)
+            elif coding == "deflate":
+                # Meant to be zlib-wrapped, but raw deflate is common too
+                try:
+                    data = zlib.decompress(data)
+                except zlib.error:
+                    data = zlib.decompress(data, -zlib.MAX_WBITS)
+            else:
+                raise ValueError(f"unsupported content-encoding {coding!r}")
+        except (OSError, EOFError, zlib.error) as e:
+            raise ValueError(f"{coding} body: {e}") from None
+    return data
+
+
+def iter_frames(data) -> list:
+    """Split an enveloped stream into (flags, message) pairs.
+
+    Returns a single (0, data) pair when data isn't a clean sequence of
+    envelopes, i.e. it is a bare unary message.
+    """
+    mv = memoryview(data)
+    frames = []
+    pos = 0
+    while pos + 5 <= len(mv):
+        flags = mv[pos]
+        length = int.from_bytes(mv[pos + 1:pos + 5], "big")
+        end = pos + 5 + length
+        if flags & ~(FLAG_COMPRESSED | FLAG_END_STREAM) or end > len(mv):
+            return [(0, mv)]
+        frames.append((flags, mv[pos + 5:end]))
+        pos = end
+
+    if pos != len(mv) or not frames:
+        return [(0, mv)]
+    return frames
+
+
+def parse_fields(buf) -> list:
+    """Parse one message into (field_number, wire_type, value) triples.
+
+    Raises ValueError if buf isn't a well-formed message.
+    """
+    fields = []
+    pos = 0
+    end = len(buf)
+    while pos < end:
+        key, pos = decode_varint(buf, pos)
+        number, wire_type = key >> 3, key & 7
+        if number == 0:
+            raise ValueError("field number 0")
+
+        if wire_type == VARINT:
+            value, pos = decode_varint(buf, pos)
+        elif wire_type == FIXED64:
+            value, pos = buf[pos:pos + 8], pos + 8
+        elif wire_type == LEN:
+            length, pos = decode_varint(buf, pos)
+            value, pos = buf[pos:pos + length], pos + length
+        elif wire_type == FIXED32:
+            value, pos = buf[pos:pos + 4], pos + 4
+        else:
+            raise ValueError(f"unsupported wire type {wire_type}")
+
+        if pos > end:
+            raise ValueError("field runs past end of message")
+        fields.append((number, wire_type, value))
+    return fields
+
+
+def _as_text(value):
+    try:
+        text = bytes(value).decode("utf-8")
+    except UnicodeDecodeError:
+        return None
+    if all(c.isprintable() or c in "\n\r\t" for c in text):
+        return text
+    return None
+
+
+def format_message(buf, depth: int = 0) -> list:
+    """Render a message as protoscope-like lines"""
+    pad = "  " * depth
+    lines = []
+    for number, wire_type, value in parse_fields(buf):
+        if wire_type == VARINT:
+            lines.append(f"{pad}{number}: {value}")
+        elif wire_type in (FIXED64, FIXED32):
+            width = "i64" if wire_type == FIXED64 else "i32"
+            lines.append(f"{pad}{number}: {int.from_bytes(value, 'little')}{width}")
+        else:
+            text = _as_text(value)
+            nested = None
+            if text is None and value and depth < MAX_DEPTH:
+                try:
+                    nested = format_message(value, depth + 1)
+                except ValueError:
+                    pass
+
+            if text is not None:
+                lines.append(f"{pad}{number}: {text!r}")
+            elif nested is not None:
+                lines.append(f"{pad}{number}: {{")
+                lines.extend(nested)
+                lines.append(f"{pad}}}")
+            else:
+                lines.append(f"{pad}{number}: `{bytes(value).hex()}`")
+    return lines
+
+
+def format_body(data) -> str:
+    """Render every envelope of a captured body; raises ValueError if undecodable"""
+    out = []
+    for n, (flags, message) in enumerate(iter_frames(data)):
+        out.append(f"# frame {n} flags=0x{flags:02x} ({len(message):,} bytes)")
+        if flags & FLAG_END_STREAM:
+            # End-of-stream envelopes carry JSON, not protobuf
+            out.append(bytes(message).decode("utf-8", errors="replace"))
+            continue
+        if flags & FLAG_COMPRESSED:
+            try:
+                message = memoryview(gzip.decompress(message))
+            except (OSError, EOFError, zlib.error) as e:
+                raise ValueError(f"frame {n}: {e}") from None
+        out.extend(format_message(message))
+    return "\n".join(out)